@@ -17,12 +17,18 @@
 # specific language governing permissions and limitations
 # under the License.
 #
+import html
+import logging
 import os
 import subprocess
 import re
+import selectors
+import shlex
+import threading
 import time
 import requests
-from bs4 import BeautifulSoup as bs
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from airflow.hooks.base_hook import BaseHook
 from airflow.exceptions import AirflowException
@@ -33,6 +39,62 @@ try:
 except ImportError:
     pass
 
+# The YARN and spark REST answers are parsed by orjson when it is available
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+
+# Patterns used to extract the ids of the submitted application from the
+# spark-submit output, compiled once as they are matched against every line.
+# Each line is first checked for the literal part of the pattern, which is
+# much cheaper than a regex search on the lines that can not match.
+_YARN_APPLICATION_ID_RE = re.compile(r'(application_\d+_\d+)')
+_KUBERNETES_DRIVER_POD_RE = re.compile(r'\s*pod name: ((.+?)-([a-z0-9]+)-driver)')
+_KUBERNETES_EXIT_CODE_RE = re.compile(r'\s*exit code: (\d+)')
+_STANDALONE_DRIVER_ID_RE = re.compile(r'(driver-[0-9\-]+)')
+
+# Matches the value, quoted or not, of a key value pair argument whose key
+# contains secret or password
+_MASK_RE = re.compile(r"^([^=]*(?:secret|password)[^=]*=\s*)(['\"]?).*?\2$", re.I | re.S)
+
+# Node manager address and container id of the application master container log url,
+# e.g. http://<host>:8042/node/containerlogs/<container id>/<user>
+_AM_CONTAINER_LOGS_URL_RE = re.compile(r'(https?://[^/]+)/node/containerlogs/(container_[a-z0-9_]+)')
+
+# The driver log is the content of the last <pre> tag of the YARN container log page
+_PRE_RE = re.compile(rb'<pre[^>]*>([\s\S]*?)</pre>', re.I)
+
+# Lines of the Kubernetes driver log starting at a chinese character (U+4E00 to
+# U+9FA5), matched on the UTF-8 encoded log so only the matched spans are decoded
+_CJK_LINE_RE = re.compile(rb'(?:\xe4[\xb8-\xbf][\x80-\xbf]|[\xe5-\xe8][\x80-\xbf]{2}'
+                          rb'|\xe9[\x80-\xbd][\x80-\xbf]|\xe9\xbe[\x80-\xa5])+.*')
+
+# Number of spark-submit output lines forwarded to the task log in a single record
+_LOG_BATCH_SIZE = 64
+
+# Number of bytes read at once from the spark-submit output pipe
+_READ_CHUNK_SIZE = 1 << 16
+
+# Seconds of silence of the spark-submit process after which a heartbeat is logged
+_SUBMIT_HEARTBEAT_INTERVAL = 30.0
+
+# Seconds to wait for the spark standalone REST server to answer a status request
+_STATUS_REQUEST_TIMEOUT = 30
+
+# Seconds to wait for the YARN resource manager to answer an application request
+_RM_REQUEST_TIMEOUT = 30
+
+# Seconds to wait for the YARN node manager to answer a driver log request
+_LOG_REQUEST_TIMEOUT = 5
+
+# Seconds to wait for the spark history server to answer a single request
+_HISTORY_REQUEST_TIMEOUT = 5
+
+# Seconds to wait in total for the spark history server to know the application
+_HISTORY_WAIT_TIMEOUT = 60
+
 
 class SparkSubmitHook(BaseHook, LoggingMixin):
     """
@@ -153,14 +215,17 @@ class SparkSubmitHook(BaseHook, LoggingMixin):
         self._status_poll_interval = status_poll_interval
         self._application_args = application_args
         self._env_vars = env_vars
+        self._base_env = {**os.environ, **(self._env_vars or {})}
         self._verbose = verbose
         self._submit_sp = None
         self._yarn_application_id = None
         self._kubernetes_driver_pod = None
         self._spark_binary = spark_binary
         self._cmd = cmd
+        self._cmd_tokens = None
 
         self._connection = self._resolve_connection()
+        self._spark_binary_path = tuple(self._get_spark_binary_path())
         self._is_yarn = 'yarn' in self._connection['master']
         self._is_kubernetes = 'k8s' in self._connection['master']
         if self._is_kubernetes and kube_client is None:
@@ -172,6 +237,11 @@ class SparkSubmitHook(BaseHook, LoggingMixin):
         self._driver_id = None
         self._driver_status = None
         self._spark_exit_code = None
+        self._http = None
+        self._yarn_log_url = None
+        self._yarn_log_url_prefetch = None
+        self._yarn_log_url_prefetch_stop = threading.Event()
+        self._scan_line = self._resolve_log_line_scanner()
 
     def _resolve_should_track_driver_status(self):
         """
@@ -182,6 +252,30 @@ class SparkSubmitHook(BaseHook, LoggingMixin):
         return ('spark://' in self._connection['master'] and
                 self._connection['deploy_mode'] == 'cluster')
 
+    def _resolve_log_line_scanner(self):
+        """
+        Determines which information has to be extracted from the spark-submit output,
+        which only depends on the master and deploy mode of the connection
+        :return: the method used to scan a single line of the spark-submit output
+        """
+        # If we run yarn cluster mode, we want to extract the application id from
+        # the logs so we can kill the application when we stop it unexpectedly
+        if self._is_yarn and self._connection['deploy_mode'] == 'cluster':
+            return self._scan_yarn_log_line
+
+        # If we run Kubernetes cluster mode, we want to extract the driver pod id
+        # from the logs so we can kill the application when we stop it unexpectedly
+        elif self._is_kubernetes:
+            return self._scan_kubernetes_log_line
+
+        # if we run in standalone cluster mode and we want to track the driver status
+        # we need to extract the driver id from the logs. This allows us to poll for
+        # the status using the driver id. Also, we can kill the driver when needed.
+        elif self._should_track_driver_status:
+            return self._scan_standalone_log_line
+
+        return self._skip_log_line
+
     def _resolve_connection(self):
         # Build from connection master or default to yarn if not available
         conn_data = {'master': 'yarn',
@@ -237,28 +331,39 @@ class SparkSubmitHook(BaseHook, LoggingMixin):
 
     def _mask_cmd(self, connection_cmd):
         # Mask any password related fields in application args with key value pair
-        # where key contains password (case insensitive), e.g. HivePassword='abc'
-        connection_cmd_masked = re.sub(
-            r"(\S*?(?:secret|password)\S*?\s*=\s*')[^']*(?=')",
-            r'\1******', ' '.join(connection_cmd), flags=re.I)
-
-        return connection_cmd_masked
+        # where key contains password (case insensitive), e.g. HivePassword='abc'.
+        # The arguments are masked one by one as the quotes are gone once the
+        # command is tokenized.
+        return ' '.join(_MASK_RE.sub(r'\1\2******\2', arg) for arg in connection_cmd)
 
     def _build_spark_submit_command(self, cmd):
         """
         Construct the spark-submit command to execute.
 
-        :param application: command to append to the spark-submit command
-        :type application: str
+        :param cmd: command to append to the spark-submit command, either already
+            tokenized or a string which is split with shell quoting rules
+        :type cmd: str or list
         :return: full command to be executed
         """
-        connection_cmd = self._get_spark_binary_path()
+        connection_cmd = list(self._spark_binary_path)
 
-        # The url of the spark master
-        cmd_list = cmd.split()
+        # The command is tokenized once, quoted arguments may contain spaces
+        if isinstance(cmd, str):
+            if self._cmd_tokens is None or self._cmd_tokens[0] != cmd:
+                try:
+                    self._cmd_tokens = (cmd, shlex.split(cmd))
+                except ValueError as e:
+                    raise AirflowException(
+                        "Cannot parse: {}. Error is: {}.".format(
+                            self._mask_cmd(connection_cmd + cmd.split()), e
+                        )
+                    )
+            cmd_list = self._cmd_tokens[1]
+        else:
+            cmd_list = cmd
         connection_cmd += cmd_list
-        self.log.info("commond: %s", str(connection_cmd))
-        self.log.info("Spark-Submit cmd: %s", self._mask_cmd(connection_cmd))
+        if self.log.isEnabledFor(logging.INFO):
+            self.log.info("Spark-Submit cmd: %s", self._mask_cmd(connection_cmd))
 
         return connection_cmd
 
@@ -268,45 +373,88 @@ class SparkSubmitHook(BaseHook, LoggingMixin):
 
         :return: full command to be executed
         """
-        curl_max_wait_time = 30
-        spark_host = self._connection['master']
-        if spark_host.endswith(':6066'):
-            spark_host = spark_host.replace("spark://", "http://")
-            connection_cmd = [
-                "/usr/bin/curl",
-                "--max-time",
-                str(curl_max_wait_time),
-                "{host}/v1/submissions/status/{submission_id}".format(
-                    host=spark_host,
-                    submission_id=self._driver_id)]
-            self.log.info(connection_cmd)
-
-            # The driver id so we can poll for its status
-            if self._driver_id:
-                pass
-            else:
-                raise AirflowException(
-                    "Invalid status: attempted to poll driver " +
-                    "status but no driver id is known. Giving up.")
+        connection_cmd = list(self._spark_binary_path)
 
+        # The url to the spark master
+        connection_cmd += ["--master", self._connection['master']]
+
+        # The driver id so we can poll for its status
+        if self._driver_id:
+            connection_cmd += ["--status", self._driver_id]
         else:
+            raise AirflowException(
+                "Invalid status: attempted to poll driver " +
+                "status but no driver id is known. Giving up.")
 
-            connection_cmd = self._get_spark_binary_path()
+        self.log.debug("Poll driver status cmd: %s", connection_cmd)
 
-            # The url to the spark master
-            connection_cmd += ["--master", self._connection['master']]
+        return connection_cmd
 
-            # The driver id so we can poll for its status
-            if self._driver_id:
-                connection_cmd += ["--status", self._driver_id]
-            else:
-                raise AirflowException(
-                    "Invalid status: attempted to poll driver " +
-                    "status but no driver id is known. Giving up.")
+    def _build_track_driver_status_url(self):
+        """
+        Construct the url of the spark standalone REST server to poll the driver status.
 
-        self.log.debug("Poll driver status cmd: %s", connection_cmd)
+        :return: url to request
+        """
+        # The driver id so we can poll for its status
+        if not self._driver_id:
+            raise AirflowException(
+                "Invalid status: attempted to poll driver " +
+                "status but no driver id is known. Giving up.")
 
-        return connection_cmd
+        spark_host = self._connection['master'].replace("spark://", "http://")
+        status_url = "{host}/v1/submissions/status/{submission_id}".format(
+            host=spark_host,
+            submission_id=self._driver_id)
+
+        self.log.debug("Poll driver status url: %s", status_url)
+
+        return status_url
+
+    def _get_http_session(self):
+        """
+        Returns the HTTP session of the hook, the connections to the spark master,
+        the YARN resource manager and node manager are kept alive in between requests.
+        A single connection per host is enough as the requests are issued one after
+        another.
+        """
+        if self._http is None:
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=1)
+            self._http = requests.Session()
+            self._http.mount('http://', adapter)
+            self._http.mount('https://', adapter)
+
+        return self._http
+
+    def close(self):
+        """
+        Stops the prefetch of the driver log url and closes the connections kept
+        alive by the HTTP session of the hook
+        """
+        # The prefetch thread uses the session, it has to be done before closing
+        # it or it would quietly open a new one
+        self._stop_yarn_log_url_prefetch()
+
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+
+    def _reset_submit_state(self):
+        """
+        Forgets everything captured by a previous submit of the hook, so a new one
+        does not print or kill the application of the previous run
+        """
+        self._stop_yarn_log_url_prefetch()
+        self._yarn_log_url_prefetch = None
+        self._yarn_log_url_prefetch_stop = threading.Event()
+        self._yarn_log_url = None
+
+        self._yarn_application_id = None
+        self._kubernetes_driver_pod = None
+        self._driver_id = None
+        self._driver_status = None
+        self._spark_exit_code = None
+        self._scan_line = self._resolve_log_line_scanner()
 
     def submit(self, application="", cmd="", **kwargs):
         """
@@ -315,24 +463,26 @@ class SparkSubmitHook(BaseHook, LoggingMixin):
         :param application: Submitted application, jar or py file
         :type application: str
         :param kwargs: extra arguments to Popen (see subprocess.Popen)
-        :param cmd: cmd
-        :type cmd: str
+        :param cmd: arguments of the spark-submit command
+        :type cmd: str or list
         """
+        self._reset_submit_state()
         spark_submit_cmd = self._build_spark_submit_command(cmd)
 
-        if hasattr(self, '_env_vars'):
-            env = os.environ.copy()
-            env.update(self._env_vars)
-            kwargs["env"] = env
+        # The environment is only copied if the caller overrides some variables
+        if "env" in kwargs:
+            kwargs["env"] = {**self._base_env, **kwargs["env"]}
+        else:
+            kwargs["env"] = self._base_env
 
         self._submit_sp = subprocess.Popen(spark_submit_cmd,
                                            stdout=subprocess.PIPE,
                                            stderr=subprocess.STDOUT,
-                                           bufsize=-1,
-                                           universal_newlines=True,
+                                           bufsize=0,
                                            **kwargs)
 
-        self._process_spark_submit_log(iter(self._submit_sp.stdout.readline, ''))
+        self._process_spark_submit_log(
+            self._iter_submit_output(self._submit_sp.stdout.fileno()))
         returncode = self._submit_sp.wait()
 
         # Check spark-submit return code. In Kubernetes mode, also check the value
@@ -369,6 +519,61 @@ class SparkSubmitHook(BaseHook, LoggingMixin):
                 )
         self._print_driver_log()
 
+    def _iter_submit_output(self, fd):
+        """
+        Reads the output of the spark-submit process in chunks, rather than line by
+        line, and decodes every chunk at once.
+
+        :param fd: The file descriptor of the pipe the subprocess writes to
+        :return: An iterator over the lines written by the subprocess, with a None
+            marker each time the output available so far has been consumed
+        """
+        tail = b''
+        idle_time = 0
+        with selectors.DefaultSelector() as selector:
+            selector.register(fd, selectors.EVENT_READ)
+            while True:
+                # Wait for output with a timeout, so silent stretches of the process
+                # do not block the task without any sign of life. The lines read so
+                # far were flushed by the consumer on the None marker below, so the
+                # heartbeat never reports silence while output is held back.
+                if not selector.select(_SUBMIT_HEARTBEAT_INTERVAL):
+                    idle_time += _SUBMIT_HEARTBEAT_INTERVAL
+                    self._heartbeat(idle_time)
+                    continue
+
+                idle_time = 0
+                chunk = os.read(fd, _READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                # Only decode up to the last complete line, a multi byte character
+                # may be split over two chunks
+                data = tail + chunk
+                end = data.rfind(b'\n') + 1
+                tail = data[end:]
+                if end:
+                    for line in data[:end].decode('utf-8', 'replace').splitlines():
+                        yield line
+
+                    # Everything written so far is handed out, let the consumer
+                    # flush before waiting for more output
+                    yield None
+
+        if tail:
+            yield tail.decode('utf-8', 'replace')
+
+    def _heartbeat(self, idle_time):
+        """
+        Called whenever the spark-submit process did not write any output for
+        _SUBMIT_HEARTBEAT_INTERVAL seconds
+
+        :param idle_time: Seconds since the last output of the process
+        :type idle_time: float
+        """
+        self.log.info("Waiting for %s, no output for %d seconds",
+                      self._connection['spark_binary'], idle_time)
+
     def _process_spark_submit_log(self, itr):
         """
         Processes the log files and extracts useful information out of it.
@@ -379,47 +584,80 @@ class SparkSubmitHook(BaseHook, LoggingMixin):
         Remark: If the driver needs to be tracked for its status, the log-level of the
         spark deploy needs to be at least INFO (log4j.logger.org.apache.spark.deploy=INFO)
 
-        :param itr: An iterator which iterates over the input of the subprocess
+        :param itr: An iterator which iterates over the input of the subprocess, a
+            None item marks that no more output is available right now
         """
-        # Consume the iterator
-        i = 0
+        log_info = self.log.info
+        info_enabled = self.log.isEnabledFor(logging.INFO)
+        buf = []
+
+        # Consume the iterator, the output is forwarded in batches to save on
+        # handler invocations, the identified ids are still logged immediately.
+        # A batch is flushed early once the available output is drained, so
+        # lines are never held back while waiting for the process.
+        # The scanner is looked up for every line as it is swapped once the ids
+        # it looks for are found.
         for line in itr:
-            line = line.strip()
-            # If we run yarn cluster mode, we want to extract the application id from
-            # the logs so we can kill the application when we stop it unexpectedly
-            if self._is_yarn and self._connection['deploy_mode'] == 'cluster':
-                match = re.search('(application[0-9_]+)', line)
-                if match:
-                    self._yarn_application_id = match.groups()[0]
-                    if i == 0:
-                        self.log.info("Identified spark driver id: %s", self._yarn_application_id)
-                    i += 1
+            if line is None:
+                if buf:
+                    log_info("\n".join(buf))
+                    buf = []
+                continue
 
-            # If we run Kubernetes cluster mode, we want to extract the driver pod id
-            # from the logs so we can kill the application when we stop it unexpectedly
-            elif self._is_kubernetes:
-                match = re.search(r'\s*pod name: ((.+?)-([a-z0-9]+)-driver)', line)
-                if match:
-                    self._kubernetes_driver_pod = match.groups()[0]
-                    self.log.info("Identified spark driver pod: %s",
-                                  self._kubernetes_driver_pod)
-
-                # Store the Spark Exit code
-                match_exit_code = re.search(r'\s*exit code: (\d+)', line)
-                if match_exit_code:
-                    self._spark_exit_code = int(match_exit_code.groups()[0])
-
-            # if we run in standalone cluster mode and we want to track the driver status
-            # we need to extract the driver id from the logs. This allows us to poll for
-            # the status using the driver id. Also, we can kill the driver when needed.
-            elif self._should_track_driver_status and not self._driver_id:
-                match_driver_id = re.search(r'(driver-[0-9\-]+)', line)
-                if match_driver_id:
-                    self._driver_id = match_driver_id.groups()[0]
-                    self.log.info("identified spark driver id: {}"
-                                  .format(self._driver_id))
-
-            self.log.info(line)
+            line = line.strip()
+            self._scan_line(line)
+            if info_enabled:
+                buf.append(line)
+                if len(buf) >= _LOG_BATCH_SIZE:
+                    log_info("\n".join(buf))
+                    buf = []
+
+        if buf:
+            log_info("\n".join(buf))
+
+    def _scan_yarn_log_line(self, line):
+        if 'application_' not in line:
+            return
+
+        match = _YARN_APPLICATION_ID_RE.search(line)
+        if match:
+            self._yarn_application_id = match.groups()[0]
+            self.log.info("Identified spark driver id: %s", self._yarn_application_id)
+            self._start_yarn_log_url_prefetch()
+            self._scan_line = self._skip_log_line
+
+    def _scan_kubernetes_log_line(self, line):
+        match = 'pod name: ' in line and _KUBERNETES_DRIVER_POD_RE.search(line)
+        if match:
+            self._kubernetes_driver_pod = match.groups()[0]
+            self.log.info("Identified spark driver pod: %s",
+                          self._kubernetes_driver_pod)
+            self._scan_line = self._scan_kubernetes_exit_code_log_line
+
+        self._scan_kubernetes_exit_code_log_line(line)
+
+    def _scan_kubernetes_exit_code_log_line(self, line):
+        # Store the Spark Exit code
+        if 'exit code: ' not in line:
+            return
+
+        match_exit_code = _KUBERNETES_EXIT_CODE_RE.search(line)
+        if match_exit_code:
+            self._spark_exit_code = int(match_exit_code.groups()[0])
+
+    def _scan_standalone_log_line(self, line):
+        if 'driver-' not in line:
+            return
+
+        match_driver_id = _STANDALONE_DRIVER_ID_RE.search(line)
+        if match_driver_id:
+            self._driver_id = match_driver_id.groups()[0]
+            self.log.info("identified spark driver id: {}"
+                          .format(self._driver_id))
+            self._scan_line = self._skip_log_line
+
+    def _skip_log_line(self, line):
+        pass
 
     def _process_spark_status_log(self, itr):
         """
@@ -428,6 +666,8 @@ class SparkSubmitHook(BaseHook, LoggingMixin):
         :param itr: An iterator which iterates over the input of the subprocess
         """
         driver_found = False
+        debug_enabled = self.log.isEnabledFor(logging.DEBUG)
+        buf = []
         # Consume the iterator
         for line in itr:
             line = line.strip()
@@ -438,7 +678,11 @@ class SparkSubmitHook(BaseHook, LoggingMixin):
                     .replace(',', '').replace('\"', '').strip()
                 driver_found = True
 
-            self.log.debug("spark driver status log: {}".format(line))
+            if debug_enabled:
+                buf.append(line)
+
+        if buf:
+            self.log.debug("spark driver status log: {}".format("\n".join(buf)))
 
         if not driver_found:
             self._driver_status = "UNKNOWN"
@@ -479,6 +723,15 @@ class SparkSubmitHook(BaseHook, LoggingMixin):
         missed_job_status_reports = 0
         max_missed_job_status_reports = 10
 
+        # The REST server of a standalone master is requested directly, any
+        # other master is polled through spark-submit. Neither the url nor the
+        # command change in between polls, so they are only built once.
+        if self._connection['master'].endswith(':6066'):
+            status_url = self._build_track_driver_status_url()
+        else:
+            status_url = None
+            poll_drive_status_cmd = self._build_track_driver_status_command()
+
         # Keep polling as long as the driver is processing
         while self._driver_status not in ["FINISHED", "UNKNOWN",
                                           "KILLED", "FAILED", "ERROR"]:
@@ -489,15 +742,17 @@ class SparkSubmitHook(BaseHook, LoggingMixin):
             self.log.debug("polling status of spark driver with id {}"
                            .format(self._driver_id))
 
-            poll_drive_status_cmd = self._build_track_driver_status_command()
-            status_process = subprocess.Popen(poll_drive_status_cmd,
-                                              stdout=subprocess.PIPE,
-                                              stderr=subprocess.STDOUT,
-                                              bufsize=-1,
-                                              universal_newlines=True)
+            if status_url:
+                returncode = self._poll_driver_status_by_rest(status_url)
+            else:
+                status_process = subprocess.Popen(poll_drive_status_cmd,
+                                                  stdout=subprocess.PIPE,
+                                                  stderr=subprocess.STDOUT,
+                                                  bufsize=-1,
+                                                  universal_newlines=True)
 
-            self._process_spark_status_log(iter(status_process.stdout.readline, ''))
-            returncode = status_process.wait()
+                self._process_spark_status_log(iter(status_process.stdout.readline, ''))
+                returncode = status_process.wait()
 
             if returncode:
                 if missed_job_status_reports < max_missed_job_status_reports:
@@ -508,21 +763,39 @@ class SparkSubmitHook(BaseHook, LoggingMixin):
                             .format(max_missed_job_status_reports, returncode)
                     )
 
+    def _poll_driver_status_by_rest(self, status_url):
+        """
+        Requests the driver status from the spark standalone REST server
+
+        :param status_url: The url of the driver status
+        :type status_url: str
+        :return: 0 if the status could be requested, non zero otherwise
+        """
+        try:
+            res = self._get_http_session().get(status_url,
+                                               timeout=_STATUS_REQUEST_TIMEOUT)
+        except requests.RequestException as e:
+            self.log.debug("spark driver status request failed: %s", e)
+            return -1
+
+        self.log.debug("spark driver status log: %s", res.content)
+        if res.status_code != 200:
+            return res.status_code
+
+        try:
+            self._driver_status = json_loads(res.content).get("driverState", "UNKNOWN")
+        except (ValueError, AttributeError) as e:
+            self.log.debug("spark driver status is not valid JSON: %s", e)
+            return -1
+
+        return 0
+
     def _build_spark_driver_kill_command(self):
         """
         Construct the spark-submit command to kill a driver.
         :return: full command to kill a driver
         """
-
-        # If the spark_home is passed then build the spark-submit executable path using
-        # the spark_home; otherwise assume that spark-submit is present in the path to
-        # the executing user
-        if self._connection['spark_home']:
-            connection_cmd = [os.path.join(self._connection['spark_home'],
-                                           'bin',
-                                           self._connection['spark_binary'])]
-        else:
-            connection_cmd = [self._connection['spark_binary']]
+        connection_cmd = list(self._spark_binary_path)
 
         # The url to the spark master
         connection_cmd += ["--master", self._connection['master']]
@@ -535,37 +808,153 @@ class SparkSubmitHook(BaseHook, LoggingMixin):
         return connection_cmd
 
     def _get_driver_stdout_and_stderr_by_spark_history(self, max_retries=30):
-        time.sleep(5)
-        i = 1
+        time.sleep(1)
         ret = {}
         yarn_application_id = self._yarn_application_id
         if not yarn_application_id:
             self.log.info("Can not get yarn application id ...")
             return -1, {}
         url = f'http://bigdata-master3.cai-inc.com:18088/api/v1/applications/{yarn_application_id}'
-        while i <= max_retries:
 
-            res = requests.get(url)
-            if res.status_code != 200:
-                i += 1
-                time.sleep(2)
-                continue
+        # Transient server errors are retried with a short exponential backoff, the
+        # whole wait for the application to show up is bounded below
+        retries = Retry(total=3,
+                        backoff_factor=0.3,
+                        status_forcelist=(500, 502, 503, 504),
+                        raise_on_status=False)
+        with requests.Session() as session:
+            session.mount('http://', HTTPAdapter(max_retries=retries))
+            session.mount('https://', HTTPAdapter(max_retries=retries))
+            try:
+                # The application is only known by the history server some time
+                # after it finished
+                deadline = time.monotonic() + _HISTORY_WAIT_TIMEOUT
+                i = 1
+                res = session.get(url, timeout=_HISTORY_REQUEST_TIMEOUT)
+                while res.status_code != 200:
+                    if i >= max_retries or time.monotonic() >= deadline:
+                        return -1, {}
+                    i += 1
+                    time.sleep(2)
+                    res = session.get(url, timeout=_HISTORY_REQUEST_TIMEOUT)
+
+                length = str(len(json_loads(res.content).get("attempts")))
+                executors_url = f"{url}/{length}/executors"
+                res = session.get(executors_url, timeout=_HISTORY_REQUEST_TIMEOUT)
+            except requests.RequestException as e:
+                self.log.info("Can not request spark history server: %s", e)
+                return -1, {}
 
-            length = str(len(res.json().get("attempts")))
-            url += f"/{length}/executors"
-            res = requests.get(url)
-            if res.status_code == 200:
-                data_list = res.json()
-                for data in data_list:
-                    if data["id"] == 'driver':
-                        ret["stdout"] = data["executorLogs"]["stdout"]
-                        ret["stderr"] = data["executorLogs"]["stderr"]
-                        return 0, ret
+        if res.status_code == 200:
+            data_list = json_loads(res.content)
+            for data in data_list:
+                if data["id"] == 'driver':
+                    ret["stdout"] = data["executorLogs"]["stdout"]
+                    ret["stderr"] = data["executorLogs"]["stderr"]
+                    return 0, ret
 
-            else:
-                return -1, {}
         return -1, {}
 
+    def _find_driver_log(self, log_html):
+        """
+        Extracts the driver log from the YARN container log page, only the matched
+        span is decoded.
+
+        :param log_html: The raw content of the log page
+        :type log_html: bytes
+        :return: the driver log or None if the page does not contain it yet
+        """
+        log_texts = _PRE_RE.findall(log_html)
+        if not log_texts:
+            return None
+
+        return html.unescape(log_texts[-1].decode('utf-8', 'replace'))
+
+    def _request_driver_log_page(self, log_url):
+        """
+        Requests the YARN container log page and extracts the driver log from it
+
+        :param log_url: The url of the application master container logs
+        :type log_url: str
+        :return: the driver log or None if the page does not contain it yet
+        """
+        try:
+            with self._get_http_session().get(log_url, timeout=_LOG_REQUEST_TIMEOUT) as res:
+                return self._find_driver_log(res.content)
+        except requests.RequestException as e:
+            self.log.debug("Can not request driver log from %s: %s", log_url, e)
+            return None
+
+    def _request_driver_log_by_rest(self, log_url):
+        """
+        Requests the driver stdout as plain text from the node manager REST api
+
+        :param log_url: The url of the application master container logs
+        :type log_url: str
+        :return: the driver log or None if it can not be requested this way
+        """
+        match = _AM_CONTAINER_LOGS_URL_RE.match(log_url)
+        if not match:
+            return None
+
+        rest_url = "{host}/ws/v1/node/containers/{container_id}/logs/stdout".format(
+            host=match.group(1),
+            container_id=match.group(2))
+        try:
+            res = self._get_http_session().get(rest_url, timeout=_LOG_REQUEST_TIMEOUT)
+        except requests.RequestException as e:
+            self.log.debug("Can not request driver log from %s: %s", rest_url, e)
+            return None
+
+        if res.status_code != 200:
+            return None
+
+        return res.content.decode('utf-8', 'replace')
+
+    def _request_yarn_log_url(self):
+        """
+        Requests the url of the driver log from the YARN resource manager
+
+        :return: the url of the application master container logs, None if the
+            application master is not launched yet
+        """
+        url = 'http://bigdata-master3.cai-inc.com:8088/ws/v1/cluster/apps/'
+        res = self._get_http_session().get(url + self._yarn_application_id,
+                                           timeout=_RM_REQUEST_TIMEOUT)
+        app_info = json_loads(res.content)
+        return app_info.get("app").get("amContainerLogs")
+
+    def _start_yarn_log_url_prefetch(self):
+        """
+        Resolves the url of the driver log in the background while spark-submit is
+        still running, so the log can be requested right away once it exited.
+        """
+        self._yarn_log_url_prefetch = threading.Thread(
+            target=self._prefetch_yarn_log_url,
+            name="yarn-log-url-prefetch",
+            daemon=True)
+        self._yarn_log_url_prefetch.start()
+
+    def _stop_yarn_log_url_prefetch(self):
+        self._yarn_log_url_prefetch_stop.set()
+        if self._yarn_log_url_prefetch is not None:
+            self._yarn_log_url_prefetch.join()
+
+    def _prefetch_yarn_log_url(self):
+        # The url is only known once the application master is launched, keep
+        # asking for it as long as spark-submit is running or until the hook is closed
+        stop = self._yarn_log_url_prefetch_stop
+        while (not stop.is_set() and
+               self._submit_sp is not None and self._submit_sp.poll() is None):
+            try:
+                self._yarn_log_url = self._request_yarn_log_url()
+            except (requests.RequestException, ValueError, AttributeError) as e:
+                self.log.debug("Can not prefetch driver log url: %s", e)
+
+            if self._yarn_log_url:
+                return
+            stop.wait(self._status_poll_interval)
+
     def _print_driver_log(self):
         # result_code, results = self._get_driver_stdout_and_stderr()
         # if result_code == -1:
@@ -573,43 +962,71 @@ class SparkSubmitHook(BaseHook, LoggingMixin):
         #     return
         # else:
         #     self.log.info("Print driver log ...")
-        #     content = requests.get(results["stdout"].replace("-4096", "0")).text
-        #     html = bs(content, 'html.parser')
-        #     self.log.info(html.find("pre").string)
+        #     content = requests.get(results["stdout"].replace("-4096", "0")).content
+        #     self.log.info(self._find_driver_log(content))
         if self._is_yarn:
-            url = 'http://bigdata-master3.cai-inc.com:8088/ws/v1/cluster/apps/'
             max_retries = 10
             i = 1
             if not self._yarn_application_id:
                 self.log.info("Can not get yarn application id ...")
                 return
             else:
-                app_info = requests.get(url + self._yarn_application_id).json()
-                log_url = app_info.get("app").get("amContainerLogs")
+                # Wait for the url resolved while spark-submit was running
+                if self._yarn_log_url_prefetch is not None:
+                    self._yarn_log_url_prefetch.join()
+
+                # The application master may have been relaunched since the url was
+                # prefetched, the url of the last attempt is requested again and the
+                # prefetched one is only used if the resource manager does not answer
+                try:
+                    log_url = self._request_yarn_log_url() or self._yarn_log_url
+                except (requests.RequestException, ValueError, AttributeError) as e:
+                    self.log.info("Can not request driver log url: %s", e)
+                    log_url = self._yarn_log_url
+
+                if not log_url:
+                    self.log.info("Can not get driver log url ...")
+                    return
                 self.log.info('Driver log url: <a href="' + log_url + '">获取日志</a>')
                 time.sleep(1)
-                log_html = requests.get(log_url).text
-                log_text = bs(log_html, 'html.parser').find_all("pre")
-                while len(log_text) == 0:
+                log_text = self._request_driver_log_by_rest(log_url)
+
+                # Fall back to the log page of clusters without the node manager REST api
+                if log_text is None:
+                    log_text = self._request_driver_log_page(log_url)
+                while log_text is None:
                     if i > max_retries:
                         self.log.info("Can not get  driver log ...")
                         return
                     time.sleep(1)
-                    log_html = requests.get(log_url).text
-                    log_text = bs(log_html, 'html.parser').find_all("pre")
+                    log_text = self._request_driver_log_page(log_url)
                     i += 1
 
                 self.log.info("Print driver log ...")
-                self.log.info(log_text[-1].string)
+                self.log.info(log_text)
         if self._is_kubernetes:
-            s = subprocess.Popen(['sudo', '-u', 'root', 'kubectl', 'logs', self._kubernetes_driver_pod],
-                                 stdout=subprocess.PIPE,
-                                 stderr=subprocess.STDOUT)
-            out, err = s.communicate()
-            comp = re.compile(r'[\u4E00-\u9FA5]+.*')
-            re_result = comp.findall(out.decode('utf-8'))
-            for r in re_result:
-                self.log.info(r)
+            if not self._kubernetes_driver_pod:
+                self.log.info("Can not get kubernetes driver pod ...")
+                return
+
+            try:
+                client = kube_client.get_kube_client()
+                response = client.read_namespaced_pod_log(
+                    self._kubernetes_driver_pod,
+                    self._connection['namespace'] or 'default',
+                    _preload_content=False)
+                try:
+                    out = response.read()
+                finally:
+                    response.release_conn()
+
+            except kube_client.ApiException as e:
+                self.log.info("Exception when attempting to read the Spark driver log on K8s:")
+                self.log.exception(e)
+                return
+
+            for match in _CJK_LINE_RE.finditer(out):
+                self.log.info(match.group().decode('utf-8', 'replace'))
 
     def on_kill(self):
 
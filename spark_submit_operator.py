@@ -187,7 +187,10 @@ class SparkSubmitOperator(BaseOperator):
             spark_binary=self._spark_binary,
             cmd=self._cmd
         )
-        self._hook.submit(self._application, self._cmd)
+        try:
+            self._hook.submit(self._application, self._cmd)
+        finally:
+            self._hook.close()
 
     def on_kill(self):
         self._hook.on_kill()
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+from airflow.exceptions import AirflowException
+
+from spark_submit_hook import SparkSubmitHook
+
+
+class TestSparkSubmitHook(unittest.TestCase):
+
+    def setUp(self):
+        # Without a connection the hook defaults to yarn
+        with mock.patch.object(SparkSubmitHook, 'get_connection',
+                               side_effect=AirflowException):
+            self.hook = SparkSubmitHook()
+
+    def _yarn_cluster_hook(self):
+        conn = mock.Mock(host='yarn', port=None,
+                         extra_dejson={'deploy-mode': 'cluster'})
+        with mock.patch.object(SparkSubmitHook, 'get_connection',
+                               return_value=conn):
+            return SparkSubmitHook()
+
+    def test_mask_cmd(self):
+        masked = self.hook._mask_cmd([
+            'spark-submit',
+            '--conf', 'spark.ssl.keyPassword=abc',
+            "HivePassword='abc'",
+            'DbSecret="a b"',
+            'user=abc',
+            'app.jar',
+        ])
+
+        self.assertEqual(masked,
+                         'spark-submit --conf spark.ssl.keyPassword=****** '
+                         "HivePassword='******' DbSecret=\"******\" user=abc app.jar")
+
+    def test_build_spark_submit_command_masks_tokenized_password(self):
+        cmd = self.hook._build_spark_submit_command(
+            "--conf \"spark.foo=a b\" app.jar HivePassword='abc'")
+
+        self.assertEqual(cmd, ['spark-submit', '--conf', 'spark.foo=a b',
+                               'app.jar', 'HivePassword=abc'])
+        self.assertEqual(self.hook._mask_cmd(cmd),
+                         'spark-submit --conf spark.foo=a b app.jar HivePassword=******')
+
+    def test_build_spark_submit_command_unbalanced_quotes(self):
+        with self.assertRaises(AirflowException) as e:
+            self.hook._build_spark_submit_command("app.jar HivePassword='abc")
+
+        self.assertIn('HivePassword=******', str(e.exception))
+        self.assertNotIn('abc', str(e.exception))
+
+    def test_process_spark_submit_log_yarn_application_id(self):
+        hook = self._yarn_cluster_hook()
+        log_lines = [
+            'Uploading resource file:/opt/jobs/my_application_v2.jar',
+            'INFO Client: Submitted application application_1600000000000_0042',
+            'INFO Client: Application report for application_1600000000000_0043',
+        ]
+
+        hook._process_spark_submit_log(log_lines)
+
+        self.assertEqual(hook._yarn_application_id, 'application_1600000000000_0042')
+
+    @mock.patch('spark_submit_hook.subprocess.Popen')
+    def test_submit_resets_previous_run(self, mock_popen):
+        mock_popen.return_value.wait.return_value = 0
+        hook = self._yarn_cluster_hook()
+        hook._print_driver_log = mock.Mock()
+        hook._start_yarn_log_url_prefetch = mock.Mock()
+        hook._iter_submit_output = mock.Mock(side_effect=[
+            ['Submitted application application_1_0001'],
+            ['Submitted application application_1_0002'],
+        ])
+
+        hook.submit(cmd='app.jar')
+        self.assertEqual(hook._yarn_application_id, 'application_1_0001')
+        hook._yarn_log_url = 'http://nm:8042/node/containerlogs/container_1_0001_01_000001/u'
+        hook.close()
+
+        hook.submit(cmd='app.jar')
+        self.assertEqual(hook._yarn_application_id, 'application_1_0002')
+        self.assertIsNone(hook._yarn_log_url)
+        self.assertFalse(hook._yarn_log_url_prefetch_stop.is_set())
+
+    def _pipe(self, *chunks):
+        read_fd, write_fd = os.pipe()
+        for chunk in chunks:
+            os.write(write_fd, chunk)
+        os.close(write_fd)
+        self.addCleanup(os.close, read_fd)
+        return read_fd
+
+    @mock.patch('spark_submit_hook._READ_CHUNK_SIZE', 2)
+    def test_iter_submit_output_split_multi_byte_character(self):
+        fd = self._pipe(b'a\xe4\xb8', b'\xadb\n')
+
+        lines = [line for line in self.hook._iter_submit_output(fd) if line is not None]
+
+        self.assertEqual(lines, ['a\u4e2db'])
+
+    def test_iter_submit_output_trailing_partial_line(self):
+        fd = self._pipe(b'one\ntwo')
+
+        self.assertEqual(list(self.hook._iter_submit_output(fd)), ['one', None, 'two'])
+
+    @mock.patch('spark_submit_hook._SUBMIT_HEARTBEAT_INTERVAL', 0.05)
+    def test_iter_submit_output_heartbeat_after_flush(self):
+        read_fd, write_fd = os.pipe()
+        self.addCleanup(os.close, read_fd)
+        events = []
+        self.hook._heartbeat = mock.Mock(side_effect=lambda idle_time: events.append('heartbeat'))
+
+        os.write(write_fd, b'line1\n')
+
+        def write():
+            time.sleep(0.3)
+            os.write(write_fd, b'line2\n')
+            os.close(write_fd)
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        for line in self.hook._iter_submit_output(read_fd):
+            events.append(line)
+        writer.join()
+
+        # The output read so far is flushed before the silence is reported
+        self.assertEqual(events[:3], ['line1', None, 'heartbeat'])
+        self.assertEqual(events[-2:], ['line2', None])
+        self.assertNotIn('line2', events[:-2])
+
+
+if __name__ == '__main__':
+    unittest.main()